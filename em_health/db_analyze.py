@@ -137,6 +137,5 @@ def main(dbname, action, force=False):
             custom_query = "EXPLAIN (ANALYZE, BUFFERS, FORMAT TEXT) " + custom_query
 
         with DatabaseAnalyzer(dbname) as db:
-            result = db.run_query(custom_query, mode="fetchall")
-            formatted_output = "\n".join(row[0] for row in result)
-            print(formatted_output)
+            for row in db.run_query(custom_query, mode="stream"):
+                print(row[0])
@@ -25,14 +25,64 @@
 # **************************************************************************
 
 import os
+import atexit
+import logging
+import threading
 from abc import ABC, abstractmethod
+from functools import lru_cache
+from itertools import chain, islice
 from pathlib import Path
-from typing import Literal, Optional, Dict, Any
-import psycopg
+from typing import Literal, Optional, Dict, Any, Iterable
 from psycopg import sql
+from psycopg.pq import TransactionStatus
+from psycopg_pool import ConnectionPool
 
 from em_health.utils.tools import logger
 
+# Connection pools shared by all clients in the process,
+# keyed by (host, port, dbname, user)
+_POOLS: dict[tuple, ConnectionPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def close_pools() -> None:
+    """ Close all connection pools, e.g. before dropping a database. """
+    with _POOLS_LOCK:
+        for pool in _POOLS.values():
+            pool.close()
+        _POOLS.clear()
+
+
+atexit.register(close_pools)
+
+
+def reset_connection(conn) -> None:
+    """ Restore session defaults before a connection goes back to the pool,
+    so the next client does not inherit autocommit, SET values or temp tables. """
+    if conn.info.transaction_status != TransactionStatus.IDLE:
+        conn.close()  # the pool discards closed connections
+        return
+    conn.autocommit = True
+    conn.execute("RESET ALL; DISCARD TEMP")
+    conn.autocommit = False
+
+
+@lru_cache(maxsize=128)
+def compose_query(query: str,
+                  identifiers: tuple = (),
+                  strings: tuple = ()) -> sql.Composed:
+    """ Compose an SQL query with quoted identifiers and literals.
+    The result is cached, since the same statements are built repeatedly.
+
+    :param query: SQL query string with placeholders for identifiers and literals.
+    :param identifiers: sorted (name, value) pairs for identifiers, "schema.name" is split.
+    :param strings: sorted (name, value) pairs for literals, values must be hashable.
+    """
+    format_args = {k: sql.Identifier(*v.split(".")) for k, v in identifiers}
+    format_args.update({k: sql.Literal(v) for k, v in strings})
+
+    return sql.SQL(query).format(**format_args)
+
 
 class BaseDBClient(ABC):
     """Abstract base class for a database client."""
@@ -74,13 +124,16 @@ class BaseDBClient(ABC):
             if self.cur:
                 self.cur.close()
             if self.conn:
-                self.conn.close()
-                logger.info("Connection closed.")
+                self.disconnect()
 
     @abstractmethod
     def connect(self):
         ...
 
+    @abstractmethod
+    def disconnect(self):
+        ...
+
     @staticmethod
     def get_path(target: str, folder: Optional[str] = None) -> Path:
         """ Build a full path starting from the em_health/sql directory.
@@ -100,25 +153,52 @@ class PgClient(BaseDBClient):
         super().__init__(db_name, 5432, **kwargs)
         self.host = os.getenv('POSTGRES_HOST', 'localhost')
 
+    def get_pool(self) -> ConnectionPool:
+        """ Return the connection pool for this client, create it on first use. """
+        key = (self.host, self.port, self.db_name, self.username)
+        with _POOLS_LOCK:
+            if key not in _POOLS:
+                _POOLS[key] = ConnectionPool(
+                    kwargs={
+                        "host": self.host,
+                        "port": self.port,
+                        "dbname": self.db_name,
+                        "user": self.username,
+                        "password": self.password,
+                        "application_name": "EMHealth",
+                        # pooled connections are long-lived, prepare repeated statements early
+                        "prepare_threshold": 1
+                    },
+                    min_size=1,
+                    # each watcher worker holds a connection for a whole import
+                    max_size=max(int(os.getenv("POSTGRES_POOL_SIZE", 4)),
+                                 int(os.getenv("WATCH_WORKERS", 4))),
+                    check=ConnectionPool.check_connection,
+                    reset=reset_connection,
+                    timeout=10,
+                    name=f"{self.username}@{self.db_name}",
+                    open=True
+                )
+            return _POOLS[key]
+
     def connect(self):
-        self.conn = psycopg.connect(
-            host=self.host,
-            port=self.port,
-            dbname=self.db_name,
-            user=self.username,
-            password=self.password,
-            application_name="EMHealth"
-        )
+        self.conn = self.get_pool().getconn()
         self.cur = self.conn.cursor()
         logger.info("Connected to PostgreSQL %s@%s: database %s",
                     self.username, self.host, self.db_name)
 
+    def disconnect(self):
+        self.get_pool().putconn(self.conn)
+        logger.info("Connection returned to the pool.")
+
     def execute_file(self,
                      fn,
-                     variables: Optional[dict[str, str]] = None) -> None:
+                     variables: Optional[dict[str, str]] = None,
+                     commit: bool = True) -> None:
         """ Execute an SQL file.
         :param fn: Path to the .sql file.
         :param variables: Dictionary of variable names and values.
+        :param commit: If False, leave the transaction open for the caller.
         """
         if not os.path.exists(fn):
             raise FileNotFoundError(fn)
@@ -132,52 +212,128 @@ class PgClient(BaseDBClient):
                 raw_sql = raw_sql.replace(placeholder, replacement)
 
         self.cur.execute(raw_sql)
-        self.conn.commit()
+        if commit:
+            self.conn.commit()
 
     def run_query(
             self,
             query: str,
             identifiers: Optional[Dict[str, str]] = None,
             strings: Optional[Dict[str, Any]] = None,
-            values: Optional[tuple] = None,
-            mode: Literal["fetchone", "fetchmany", "fetchall", "commit", None] = "commit",
+            values: Optional[tuple | dict] = None,
+            mode: Literal["fetchone", "fetchmany", "fetchall", "stream", "commit", None] = "commit",
             row_factory: Optional[Any] = None,
     ):
         """
         Execute an SQL query and optionally return results.
 
         :param query: SQL query string with placeholders for identifiers and literals.
-        :param identifiers: dict for table/column identifiers, safely quoted.
+        :param identifiers: dict for table/column identifiers, safely quoted, may be schema-qualified.
         :param strings: dict for literal values to be embedded (strings, etc.).
-        :param values: tuple for parameterized query values (%s placeholders).
-        :param mode: fetch mode or commit.
+        :param values: tuple or dict for parameterized query values (%s or %(name)s placeholders).
+        :param mode: fetch mode or commit. "stream" returns a generator that yields
+            rows as they arrive, the connection must not be used until it is exhausted.
         :param row_factory: cursor row factory to customize output.
         """
-        if row_factory is not None:
-            self.cur.row_factory = row_factory
+        sql_query = compose_query(query,
+                                  tuple(sorted((identifiers or {}).items())),
+                                  tuple(sorted((strings or {}).items())))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Executing query:\n%s", sql_query.as_string(self.conn))
 
-        # Compose SQL query with identifiers and literals
-        sql_query = sql.SQL(query)
-        format_args = {}
+        if mode == "stream":
+            return self._stream(sql_query, values, row_factory)
 
-        if identifiers:
-            format_args.update({k: sql.Identifier(v) for k, v in identifiers.items()})
-        if strings:
-            format_args.update({k: sql.Literal(v) for k, v in strings.items()})
+        # use a dedicated cursor for custom rows, so the default one is left untouched
+        if row_factory is None:
+            return self._execute(self.cur, sql_query, values, mode)
 
-        sql_query = sql_query.format(**format_args)
-        logger.debug("Executing query:\n%s", sql_query.as_string(self.conn))
+        with self.conn.cursor(row_factory=row_factory) as cur:
+            return self._execute(cur, sql_query, values, mode)
 
-        self.cur.execute(sql_query, values)
+    def _stream(self, sql_query, values, row_factory=None):
+        """ Yield result rows one by one instead of loading them all in memory. """
+        if row_factory is None:
+            yield from self.cur.stream(sql_query, values)
+        else:
+            with self.conn.cursor(row_factory=row_factory) as cur:
+                yield from cur.stream(sql_query, values)
+
+    def _execute(self, cur, sql_query, values, mode):
+        """ Execute a composed query on a given cursor and handle the fetch mode. """
+        cur.execute(sql_query, values)
 
         if mode == "fetchone":
-            return self.cur.fetchone()
+            return cur.fetchone()
         elif mode == "fetchmany":
-            return self.cur.fetchmany()
+            return cur.fetchmany()
         elif mode == "fetchall":
-            return self.cur.fetchall()
+            return cur.fetchall()
         elif mode == "commit":
             self.conn.commit()
             return None
         else:
             return None
+
+    def copy_insert(self,
+                    table: str,
+                    columns: list[str],
+                    rows: Iterable[tuple]) -> int:
+        """
+        Bulk insert rows with COPY. Row triggers of the target table fire
+        as for INSERT, rows skipped by a BEFORE trigger are not counted.
+
+        :param table: target table name, optionally schema-qualified.
+        :param columns: target column names, in the order of row values.
+        :param rows: iterable of tuples matching the columns.
+        :return: number of rows inserted into the target table.
+        """
+        query = sql.SQL("COPY {table} ({cols}) FROM STDIN").format(
+            table=sql.Identifier(*table.split(".")),
+            cols=sql.SQL(", ").join(map(sql.Identifier, columns)))
+
+        with self.cur.copy(query) as copy:
+            for row in rows:
+                copy.write_row(row)
+
+        return self.cur.rowcount
+
+    def execute_values(self,
+                       query: str,
+                       rows: Iterable[tuple],
+                       page_size: int = 1000) -> int:
+        """
+        Execute a multi-row VALUES statement for each page of rows,
+        similar to psycopg2.extras.execute_values.
+
+        :param query: SQL query string with a {values} placeholder.
+        :param rows: iterable of tuples, all of the same length.
+        :param page_size: maximum number of rows per statement,
+            reduced if needed to stay within the protocol limit of 65535 parameters.
+        :return: total number of affected rows.
+        """
+        rows = iter(rows)
+        first = next(rows, None)
+        if first is None:
+            return 0
+        page_size = min(page_size, 65535 // len(first))
+        rows = chain([first], rows)
+
+        total = 0
+        full_page_query = None
+        while page := list(islice(rows, page_size)):
+            is_full = len(page) == page_size
+            if not is_full or full_page_query is None:
+                row_sql = sql.SQL("({})").format(sql.SQL(", ").join([sql.Placeholder()] * len(page[0])))
+                sql_query = sql.SQL(query).format(values=sql.SQL(", ").join([row_sql] * len(page)))
+                if is_full:
+                    full_page_query = sql_query
+            else:
+                sql_query = full_page_query
+
+            # full pages share the same composed statement, whether it is prepared is left
+            # to prepare_threshold, since parameter types can differ between pages
+            self.cur.execute(sql_query, list(chain.from_iterable(page)))
+            total += self.cur.rowcount
+
+        return total
@@ -26,15 +26,22 @@
 
 import os
 import time
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
 from datetime import datetime, timezone
-from typing import Iterable, Optional, Any
+from operator import itemgetter
+from typing import Iterable, Optional
 
 from em_health.db_client import PgClient
 from em_health.utils.tools import logger, profile
 
+# Rows per multi-row INSERT, smaller parameter sets skip COPY
+INSERT_PAGE_SIZE = 1000
+
 
 class DatabaseManager(PgClient):
     """ Manager class to operate on existing db.
+    Import methods (add_*, write_data) and view scheduling helpers do not commit,
+    the caller commits, or the transaction is committed on exit from the context manager.
     Example usage:
         with DatabaseManager(dbname) as db:
             ...
@@ -45,30 +52,68 @@ class DatabaseManager(PgClient):
 
     def clean_instrument_data(self,
                               instrument_serial: int,
-                              since: Optional[str] = None) -> None:
-        """ Erase data for a particular instrument. """
-        row = self.run_query("SELECT id FROM public.instruments WHERE serial = %s",
-                             values=(instrument_serial,),
-                             mode="fetchone")
-        instrument_id = row[0] if row else None
-
-        if instrument_id is None:
+                              since: Optional[datetime] = None) -> None:
+        """ Erase data for a particular instrument.
+        Unlike the import methods, this commits its own changes.
+        :param instrument_serial: Instrument serial number
+        :param since: if set, only delete data older than this datetime
+        """
+        # data chunks hold rows of all instruments, so whole chunks can only be
+        # dropped when this is the only instrument and we own the hypertable
+        row = self.run_query("""
+            SELECT i.id,
+                   NOT EXISTS (SELECT 1 FROM public.instruments o WHERE o.id <> i.id)
+                   AND pg_has_role(c.relowner, 'USAGE')
+            FROM public.instruments i, pg_class c
+            WHERE i.serial = %s AND c.oid = 'public.data'::regclass
+        """, values=(instrument_serial,), mode="fetchone")
+
+        if row is None:
             logger.error("No such instrument: %d", instrument_serial)
             raise ValueError("Wrong serial number")
+        instrument_id, drop_chunks = row
 
         if since is None:
+            if drop_chunks:
+                self.run_query("TRUNCATE TABLE public.data", mode=None)
             # cascade delete all data for the instrument
             self.run_query("DELETE FROM public.instruments WHERE id = %s",
-                           values=(instrument_id,))
+                           values=(instrument_id,), mode=None)
             logger.info("Deleted instrument %s and all associated data", instrument_serial)
         else:
-            from_date = datetime.strptime(since, "%d-%m-%Y").replace(tzinfo=timezone.utc)
-            self.run_query("DELETE FROM public.data WHERE instrument_id = %s AND time < %s",
-                           values=(instrument_id, from_date))
-            self.run_query("DELETE FROM uec.errors WHERE InstrumentId = %s AND Time < %s",
-                           values=(instrument_id, from_date))
+            done_until = None
+            if not drop_chunks:
+                # delete chunk by chunk and commit in between to keep locks and WAL bursts short,
+                # cleanup is idempotent, so it can be simply re-run if interrupted
+                chunks = self.run_query("""
+                    SELECT range_start, range_end FROM timescaledb_information.chunks
+                    WHERE hypertable_schema = 'public' AND hypertable_name = 'data'
+                    AND range_end <= %s
+                    ORDER BY range_start
+                """, values=(since,), mode="fetchall")
+                for range_start, range_end in chunks:
+                    self.run_query("""
+                        DELETE FROM public.data
+                        WHERE instrument_id = %s AND time >= %s AND time < %s
+                    """, values=(instrument_id, range_start, range_end), mode=None)
+                    self.conn.commit()  # each chunk is its own transaction
+                    done_until = range_end
+
+            # the remaining deletes are independent, send them in one round-trip,
+            # they are committed together, but separately from the per-chunk deletes above
+            with self.conn.pipeline():
+                if drop_chunks:
+                    # remove chunks entirely older than since, the DELETE handles the boundary chunk
+                    self.run_query("SELECT drop_chunks('public.data', older_than => %s)",
+                                   values=(since,), mode=None)
+                self.run_query("""
+                    DELETE FROM public.data
+                    WHERE instrument_id = %s AND time >= COALESCE(%s, '-infinity'::timestamptz) AND time < %s
+                """, values=(instrument_id, done_until, since), mode=None)
+                self.run_query("DELETE FROM uec.errors WHERE InstrumentId = %s AND Time < %s",
+                               values=(instrument_id, since), mode=None)
             logger.info("Deleted data older than %s for instrument %s",
-                        from_date, instrument_serial)
+                        since, instrument_serial)
 
         self.conn.commit()
 
@@ -80,17 +125,15 @@ class DatabaseManager(PgClient):
         self.instrument_name = instr_dict["name"]
         instrument_id = self.run_query("""
             INSERT INTO instruments (instrument, serial, model, name, template, server)
-            VALUES (%s, %s, %s, %s, %s, %s)
-            ON CONFLICT (instrument) DO UPDATE SET instrument = EXCLUDED.instrument
+            VALUES (%(instrument)s, %(serial)s, %(model)s, %(name)s, %(template)s, %(server)s)
+            ON CONFLICT (instrument) DO UPDATE SET
+                serial = EXCLUDED.serial,
+                model = EXCLUDED.model,
+                name = EXCLUDED.name,
+                template = EXCLUDED.template,
+                server = EXCLUDED.server
             RETURNING id;
-        """, values=(
-            instr_dict["instrument"],
-            instr_dict["serial"],
-            instr_dict["model"],
-            self.instrument_name,
-            instr_dict["template"],
-            instr_dict["server"]
-        ), mode="fetchone")[0]
+        """, values=instr_dict, mode="fetchone")[0]
 
         logger.info("Updated public.instruments table", extra={"prefix": self.instrument_name})
 
@@ -105,38 +148,57 @@ class DatabaseManager(PgClient):
         :param enums_dict: input dict
         :return a dict {enum_types.name: enum_types.id}
         """
-        # Batch insert enum_types
-        self.cur.executemany("""
-            INSERT INTO public.enum_types (instrument_id, name)
-            VALUES (%s, %s)
-            ON CONFLICT DO NOTHING
-        """, (
-            (instrument_id, enum_name)
-            for enum_name in enums_dict.keys()
-        ))
-        logger.info("Updated public.enum_types table (%d rows)", self.cur.rowcount,
+        # Insert new enum_types and fetch IDs for ALL enums in one statement,
+        # the second SELECT sees the table before the insert, so rows are not repeated
+        rows = self.run_query("""
+            WITH new_types AS (
+                INSERT INTO public.enum_types (instrument_id, name)
+                SELECT %(instr_id)s, unnest(%(names)s::text[])
+                ON CONFLICT DO NOTHING
+                RETURNING id, name
+            )
+            SELECT id, name, true FROM new_types
+            UNION ALL
+            SELECT id, name, false FROM public.enum_types
+            WHERE instrument_id = %(instr_id)s AND name = ANY(%(names)s::text[])
+        """, values={"instr_id": instrument_id, "names": list(enums_dict.keys())},
+                              mode="stream")
+
+        enum_name_to_id = {}
+        inserted = 0
+        for enum_id, enum_name, is_new in rows:
+            enum_name_to_id[enum_name] = enum_id
+            inserted += is_new
+
+        # a type committed by a concurrent import while we waited on its row
+        # is skipped by ON CONFLICT and invisible to our snapshot, fetch it separately
+        missing = [name for name in enums_dict if name not in enum_name_to_id]
+        if missing:
+            enum_name_to_id.update(self.run_query("""
+                SELECT name, id FROM public.enum_types
+                WHERE instrument_id = %s AND name = ANY(%s::text[])
+            """, values=(instrument_id, missing), mode="fetchall"))
+
+        logger.info("Updated public.enum_types table (%d rows)", inserted,
                     extra={"prefix": self.instrument_name})
 
-        # Fetch IDs for ALL enums
-        rows = self.run_query("SELECT id, name FROM public.enum_types WHERE instrument_id = %s",
-                              values=(instrument_id,),
-                              mode="fetchall")
-        enum_name_to_id = {name: eid for eid, name in rows}
+        # Bulk insert enum_values as three parallel arrays, a single statement
+        # is cheaper than a COPY round-trip for a few hundred rows
+        enum_ids, member_names, values = [], [], []
+        for enum_name, data in enums_dict.items():
+            for member_name, value in data.items():
+                enum_ids.append(enum_name_to_id[enum_name])
+                member_names.append(member_name)
+                values.append(value)
 
-        # Batch insert enum_values
-        self.cur.executemany("""
+        self.run_query("""
             INSERT INTO public.enum_values (enum_id, member_name, value)
-            VALUES (%s, %s, %s)
-        """, (
-            (enum_name_to_id[enum_name], member_name, value)
-            for enum_name, data in enums_dict.items()
-            for member_name, value in data.items()
-        ))
-
-        logger.info("Updated public.enum_values table (%d rows)", self.cur.rowcount,
-                    extra={"prefix": self.instrument_name})
+            SELECT * FROM unnest(%s::int[], %s::text[], %s::int[])
+        """, values=(enum_ids, member_names, values), mode=None)
+        inserted = self.cur.rowcount
 
-        self.conn.commit()
+        logger.info("Updated public.enum_values table (%d rows)", inserted,
+                    extra={"prefix": self.instrument_name})
 
         return enum_name_to_id
 
@@ -149,134 +211,122 @@ class DatabaseManager(PgClient):
         :param params_dict: input params dict
         :param enums_ids: input enums dict
         """
-        insert_sql = """
-            INSERT INTO public.parameters (
-                instrument_id, param_id,
-                subsystem, component, param_name, display_name,
-                display_unit, storage_unit, enum_id, value_type,
-                event_id, event_name, abs_min, abs_max
-            ) VALUES
-            (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """
-
-        # Batch inserts
-        data_to_insert = [
-            (
-                instrument_id,
-                param_id,
-                p_dict["subsystem"],
-                p_dict["component"],
-                p_dict["param_name"],
-                p_dict["display_name"],
-                p_dict["display_unit"],
-                p_dict["storage_unit"],
-                enums_ids.get(enum) if (enum := p_dict.get("enum_name")) else None,
-                p_dict["value_type"],
-                p_dict["event_id"],
-                p_dict["event_name"],
-                p_dict["abs_min"],
-                p_dict["abs_max"]
-            ) for param_id, p_dict in params_dict.items()
+        metadata = [
+            "subsystem", "component", "param_name", "display_name",
+            "display_unit", "storage_unit", "value_type",
+            "event_id", "event_name", "abs_min", "abs_max"
         ]
-
-        self.cur.executemany(insert_sql, data_to_insert)
-        self.conn.commit()
-        logger.info("Updated public.parameters table (%d rows)", self.cur.rowcount,
+        columns = ["instrument_id", "param_id", "enum_id"] + metadata
+        get_metadata = itemgetter(*metadata)
+        get_enum_id = enums_ids.get
+
+        # Bulk insert, existing parameters are updated by a trigger
+        data_to_insert = (
+            (instrument_id, param_id, get_enum_id(p_dict.get("enum_name")), *get_metadata(p_dict))
+            for param_id, p_dict in params_dict.items()
+        )
+
+        if len(params_dict) < INSERT_PAGE_SIZE:
+            # a single multi-row INSERT is cheaper than a COPY round-trip for small sets
+            query = f"INSERT INTO public.parameters ({', '.join(columns)}) VALUES {{values}}"
+            inserted = self.execute_values(query, data_to_insert, page_size=INSERT_PAGE_SIZE)
+        else:
+            inserted = self.copy_insert("public.parameters", columns, data_to_insert)
+        logger.info("Updated public.parameters table (%d rows)", inserted,
                     extra={"prefix": self.instrument_name})
 
     #@profile
     def write_data(self,
                    rows: Iterable[tuple],
                    nocopy: bool = False,
-                   chunk_size: int = 8*1024*1024) -> None:
-        """ Write raw values to the data table using COPY and a pre-serialized text buffer.
+                   bulk: bool = False) -> int:
+        """ Write raw values to the data table using binary COPY.
         We do not sort input data, since:
          - for each parameter XML file has a batch of datapoints already sorted by time
          - TimescaleDB data table has chunking with compression, chunks will be sorted by time
 
-        :param rows: Iterable of tuples
-        :param nocopy: If True, revert to executemany
-        :param chunk_size: Number of bytes to read at a time
+        :param rows: Iterable of (datetime, int, int, float | None, str | None) tuples
+        :param nocopy: If True, revert to multi-row INSERTs
+        :param bulk: If True, the transaction commit does not wait for WAL flush,
+            only for imports that are re-run by hand if the server crashes
+        :return: number of rows inserted into the data table
         """
+        if bulk:
+            # re-importing the same XML is idempotent, so losing the last
+            # commit on a server crash is acceptable in exchange for not waiting on WAL flush
+            self.cur.execute("SET LOCAL synchronous_commit = off")
+
         if nocopy:
             query = """
                 INSERT INTO public.data (time, instrument_id, param_id, value_num, value_text)
-                VALUES (%s, %s, %s, %s, %s)
+                VALUES {values}
                 ON CONFLICT DO NOTHING
             """
-            self.cur.executemany(query, rows)
-            self.conn.commit()
+            # rows are consumed one page at a time
+            inserted = self.execute_values(query, rows, page_size=INSERT_PAGE_SIZE)
 
         else:
+            # each session stages into its own temp copy of public.data_staging,
+            # so concurrent imports neither see each other's rows nor block on TRUNCATE
+            self.cur.execute("""
+                CREATE TEMP TABLE IF NOT EXISTS data_staging
+                (LIKE public.data_staging) ON COMMIT DELETE ROWS
+            """)
+
             # staging table can have duplicate rows, they will be omitted later
             query = """
-                COPY public.data_staging (time, instrument_id, param_id, value_num, value_text)
-                FROM STDIN WITH (FORMAT text)
+                COPY pg_temp.data_staging (time, instrument_id, param_id, value_num, value_text)
+                FROM STDIN WITH (FORMAT binary)
             """
 
-            def format_col(col: Any) -> str:
-                if col is None:
-                    return "\\N"
-                if isinstance(col, datetime):
-                    # PostgreSQL COPY expects 'YYYY-MM-DD HH:MM:SS.sss+00' ISO 8601 string
-                    return col.strftime("%Y-%m-%d %H:%M:%S.%f%z")[:-3]
-                return str(col)
-
-            def stream_chunks(rows: Iterable[tuple], max_size: int) -> Iterable[str]:
-                buffer: list[str] = []
-                size = 0
-                for row in rows:
-                    newrow = "\t".join(format_col(col) for col in row) + "\n"
-                    encoded = newrow.encode("utf-8")
-                    buffer.append(newrow)
-                    size += len(encoded)
-                    if size >= max_size:
-                        yield ''.join(buffer)
-                        buffer.clear()
-                        size = 0
-                if buffer:
-                    yield ''.join(buffer)
-
-            # avg row size is ~ 48 bytes, below will give about ~175k rows per chunk
-            max_size = int(os.getenv("WRITE_DATA_CHUNK_SIZE", chunk_size))  # 8 Mb
+            # rows are dumped by psycopg binary dumpers, no text formatting or escaping required
             t0 = time.perf_counter()
             with self.cur.copy(query) as copy:
-                for chunk in stream_chunks(rows, max_size):
-                    copy.write(chunk)
+                copy.set_types(["timestamptz", "int4", "int4", "float8", "text"])
+                for row in rows:
+                    copy.write_row(row)
             t1 = time.perf_counter()
-            logger.debug(f"COPY to public.data_staging done in: {t1-t0:.4f} s")
+            logger.debug(f"COPY to data_staging done in: {t1-t0:.4f} s")
+
+            # public.data has no secondary indexes to suspend, the unique constraint
+            # is required for deduplication, so only give the sort enough memory to avoid spilling
+            self.cur.execute("SET LOCAL work_mem = '256MB'")
 
             # order by time before inserting to minimize Timescale switches between chunks
             query = """
                         INSERT INTO public.data(time, instrument_id, param_id, value_num, value_text)
                         SELECT time, instrument_id, param_id, value_num, value_text
-                        FROM data_staging
+                        FROM pg_temp.data_staging
                         ORDER BY time
                         ON CONFLICT DO NOTHING;
-                        TRUNCATE TABLE data_staging;
+                        TRUNCATE TABLE pg_temp.data_staging;
                     """
             self.cur.execute(query)
-            self.conn.commit()
+            inserted = self.cur.rowcount
             t2 = time.perf_counter()
             logger.debug(f"INSERT into public.data done in: {t2-t1:.4f} s")
 
-        logger.info("Updated public.data table (%d rows)", self.cur.rowcount,
+        logger.info("Updated public.data table (%d rows)", inserted,
                     extra={"prefix": self.instrument_name})
 
+        return inserted
+
     def drop_mview(self, name: str, is_cagg: bool = False) -> None:
         """ Delete a materialized view. """
-        self.run_query("DROP MATERIALIZED VIEW IF EXISTS {name} CASCADE",
-                       {"name": name})
-        if not is_cagg:
-            # for standard mat. views we need to manually remove the job
-            proc = f"refresh_{name}"
-            self.run_query("""
-                SELECT delete_job(job_id)
-                FROM timescaledb_information.jobs
-                WHERE proc_name = {proc}
-            """, strings={"proc": proc})
-
-            self.run_query("DROP PROCEDURE IF EXISTS {name}", {"name": name})
+        # send all drop statements in one round-trip
+        with self.conn.pipeline():
+            self.run_query("DROP MATERIALIZED VIEW IF EXISTS {name} CASCADE",
+                           {"name": name}, mode=None)
+            if not is_cagg:
+                # for standard mat. views we need to manually remove the job
+                proc = f"refresh_{name}"
+                self.run_query("""
+                    SELECT delete_job(job_id)
+                    FROM timescaledb_information.jobs
+                    WHERE proc_name = {proc}
+                """, strings={"proc": proc}, mode=None)
+
+                self.run_query("DROP PROCEDURE IF EXISTS {proc}", {"proc": proc}, mode=None)
         logger.info("Dropped materialized view %s", name)
 
     def schedule_mview_refresh(self, name: str) -> None:
@@ -293,10 +343,10 @@ class DatabaseManager(PgClient):
             AS $$
               REFRESH MATERIALIZED VIEW {name};
             $$;
-        """, {"proc": proc, "name": name})
+        """, {"proc": proc, "name": name}, mode=None)
 
         self.run_query("SELECT add_job({proc}, {period})",
-                       strings={"proc": proc, "period": period})
+                       strings={"proc": proc, "period": period}, mode=None)
         logger.info("Scheduled refresh for %s every %s", name, period)
 
     def schedule_cagg_refresh(self,
@@ -334,7 +384,7 @@ class DatabaseManager(PgClient):
             "start_offset": start_offset,
             "end_offset": end_offset,
             "schedule_interval": interval
-        })
+        }, mode=None)
         logger.info("Scheduled continuous aggregate refresh for %s", name)
 
     def force_refresh_cagg(self, name: str) -> None:
@@ -344,26 +394,31 @@ class DatabaseManager(PgClient):
         Here we aggregate all historical data that has been imported so far.
         """
         self.conn.autocommit = True  # required since CALL cannot be executed inside a transaction
-        self.run_query("CALL refresh_continuous_aggregate({name}, NULL, NULL)",
-                       strings={"name": name})
-        self.conn.autocommit = False
+        try:
+            self.run_query("CALL refresh_continuous_aggregate({name}, NULL, NULL)",
+                           strings={"name": name})
+        finally:
+            self.conn.autocommit = False
         logger.info("Forced continuous aggregate refresh for %s", name)
 
     def enable_rt_cagg(self, name: str) -> None:
         """ Real-time aggregates automatically add the most recent data when
         you query your continuous aggregate. """
         self.run_query("ALTER MATERIALIZED VIEW {name} set (timescaledb.materialized_only = false)",
-                       {"name": name})
+                       {"name": name}, mode=None)
 
-    def create_mview(self, name: str) -> None:
-        """ Create a new materialized view or a continuous aggregate. """
+    def create_mview(self, name: str, commit: bool = True) -> None:
+        """ Create a new materialized view or a continuous aggregate.
+        :param name: view name, optionally schema-qualified
+        :param commit: If False, leave the transaction open for the caller.
+        """
         if "." in name:
             schema, name = name.split(".", 1)
         else:
             schema = "public"
 
         view_fn = self.get_path(target=name+".sql", folder=schema)
-        self.execute_file(view_fn)
+        self.execute_file(view_fn, commit=commit)
         logger.info("Created materialized view %s.%s", schema, name)
 
     def migrate_db(self, latest_ver: int):
@@ -373,9 +428,11 @@ class DatabaseManager(PgClient):
         logger.info("Current schema version: %s", current_ver)
 
         if current_ver < latest_ver:
+            # apply all versions in one transaction, so a failed step leaves the schema untouched
             for v in range(current_ver + 1, latest_ver + 1):
                 view_fn = self.get_path(target=f"{v:03d}.sql", folder="migrations")
-                self.execute_file(view_fn)
+                self.execute_file(view_fn, commit=False)
+            self.conn.commit()
             logger.info("Database schema migrated to version %s", latest_ver)
         elif current_ver == latest_ver:
             logger.info("Database schema is up-to-date")
@@ -397,55 +454,68 @@ class DatabaseManager(PgClient):
 
         from em_health.fdw_manager import FDWManager
 
+        # FDW setup statements do not commit, all instruments are set up in one transaction
         for instr_id, server in servers:
             fdw = FDWManager(self, "tds_fdw", str(server), instr_id)
             job_name = fdw.setup_import_job_ms()
             self.run_query("SELECT add_job({jobname}, schedule_interval=>'1 hour')",
-                           strings={"jobname": job_name})
+                           strings={"jobname": job_name}, mode=None)
 
             logger.info("Scheduled UEC import job for instrument %s", instr_id)
 
+        self.conn.commit()
 
-def main(dbname, action, instrument=None, date=None):
-    if action == "create-stats":
-        logger.info("Running aggregation on database %s", dbname)
-        mviews: dict[str, bool] = {
-            # name: is_cagg
-            "tem_off": False,
-            "vacuum_state_daily": False,
-
-            "epu_sessions": False,
-            "tomo_sessions": False,
-
-            "epu_runs": False,
-            "tomo_runs": False,
-
-            "epu_state_daily": True,
-            "tomo_state_daily": True,
-
-            "epu_running_daily": False,
-            "tomo_running_daily": False,
-
-            "epu_counters": False,
-            "tomo_counters": False,
-
-            "load_counters_daily": True,
-            "data_counters_daily": True,
-            "image_counters_daily": True,
-        }
 
-        with DatabaseManager(dbname) as db:
-            for mview, is_cagg in mviews.items():
-                db.drop_mview(mview)
-                db.create_mview(mview)
+def create_mviews(dbname: str, mviews: dict[str, bool]) -> None:
+    """ (Re)create materialized views in order, using a separate connection.
+    :param dbname: Database name
+    :param mviews: dict {view name: is_cagg}
+    """
+    # views share one transaction committed on exit,
+    # except that a cont. aggregate must be committed before its forced refresh
+    with DatabaseManager(dbname) as db:
+        for mview, is_cagg in mviews.items():
+            db.drop_mview(mview)
+            db.create_mview(mview, commit=is_cagg)
+            if is_cagg:
+                # CALL refresh cannot run inside a transaction or a pipeline
+                db.force_refresh_cagg(mview)
+            # job and grant statements are independent, send them in one round-trip
+            with db.conn.pipeline():
                 if is_cagg:
-                    db.force_refresh_cagg(mview)
                     db.schedule_cagg_refresh(mview)
                     db.enable_rt_cagg(mview)
                 else:
                     db.schedule_mview_refresh(mview)
                 db.run_query("GRANT SELECT ON public.{mview} TO grafana",
-                             {"mview": mview})
+                             {"mview": mview}, mode=None)
+
+
+def main(dbname, action, instrument=None, date=None):
+    if action == "create-stats":
+        logger.info("Running aggregation on database %s", dbname)
+        # views within a group depend on the previous ones,
+        # groups are independent and are created in parallel
+        mview_groups: list[dict[str, bool]] = [
+            # name: is_cagg
+            {"tem_off": False, "vacuum_state_daily": False},
+            {"epu_sessions": False, "epu_runs": False, "epu_counters": False},
+            {"tomo_sessions": False, "tomo_runs": False, "tomo_counters": False},
+            {"epu_state_daily": True, "epu_running_daily": False},
+            {"tomo_state_daily": True, "tomo_running_daily": False},
+            {"load_counters_daily": True},
+            {"data_counters_daily": True},
+            {"image_counters_daily": True},
+        ]
+
+        with ThreadPoolExecutor(max_workers=int(os.getenv("POSTGRES_POOL_SIZE", 4))) as executor:
+            futures = [executor.submit(create_mviews, dbname, group) for group in mview_groups]
+            done, pending = wait(futures, return_when=FIRST_EXCEPTION)
+            # stop queued groups on the first failure, running ones finish their transaction
+            for future in pending:
+                future.cancel()
+            for future in done:
+                future.result()  # re-raise errors from workers
 
     elif action == "clean-all":
         print(f"!!! WARNING: You are about to DELETE ALL DATA from database {dbname} !!!")
@@ -462,19 +532,20 @@ def main(dbname, action, instrument=None, date=None):
         # verify args
         if not instrument:
             raise ValueError("-i is required for clean-inst")
+        since = None
         if date:
             try:
-                datetime.strptime(date, "%d-%m-%Y")
+                since = datetime.strptime(date, "%d-%m-%Y").replace(tzinfo=timezone.utc)
             except ValueError:
                 raise ValueError("Invalid date format. Use DD-MM-YYYY (e.g., 23-03-2025).")
 
         with DatabaseManager(dbname) as db:
-            if not date:
+            if since is None:
                 logger.info("Deleting data for instrument %s in %s", instrument, dbname)
                 db.clean_instrument_data(instrument)
             else:
-                logger.info("Deleting data since %s for instrument %s in %s", date, instrument, dbname)
-                db.clean_instrument_data(instrument, since=date)
+                logger.info("Deleting data older than %s for instrument %s in %s", date, instrument, dbname)
+                db.clean_instrument_data(instrument, since=since)
 
     elif action == "migrate":
         latest_ver = int(os.getenv(f"{dbname.upper()}_SCHEMA_VERSION"))
@@ -74,7 +74,7 @@ class FDWManager:
             "server": self.server,
             "user": user,
             "password": os.getenv("MSSQL_PASSWORD")
-        })
+        }, mode=None)
 
         logger.info("Setup foreign server MSSQL %s@%s:57659 database DS",
                     user, self.server)
@@ -99,7 +99,7 @@ class FDWManager:
             "server": self.server,
             "user": user,
             "password": os.getenv("MSSQL_PASSWORD")
-        })
+        }, mode=None)
 
         logger.info("Setup foreign server PostgreSQL %s@%s:60659 database ds",
                     user, self.server)
@@ -120,16 +120,14 @@ class FDWManager:
                 ErrorCode TEXT
             ) SERVER {name}
             OPTIONS (schema_name 'qry', table_name 'ErrorDefinitions');
-        """, {"schema": self.fdw_schema, "name": self.name})
 
-        self.dbm.run_query("""
             CREATE FOREIGN TABLE IF NOT EXISTS {schema}.error_notifications (
                 ErrorDtm TIMESTAMPTZ,
                 ErrorDefinitionID INTEGER,
                 MessageText TEXT
             ) SERVER {name}
             OPTIONS (schema_name 'qry', table_name 'ErrorNotifications');
-        """, {"schema": self.fdw_schema, "name": self.name})
+        """, {"schema": self.fdw_schema, "name": self.name}, mode=None)
 
     def create_fdw_tables_pg(self):
         """ Create tables for Postgres FDW. """
@@ -138,16 +136,16 @@ class FDWManager:
             LIMIT TO (event_property, event_property_type, event_type, parameter_type, instrument_event_config)
             FROM SERVER {name}
             INTO {schema};
-        """, {"schema": self.fdw_schema, "name": self.name})
+        """, {"schema": self.fdw_schema, "name": self.name}, mode=None)
 
     def setup_import_job_ms(self) -> str:
         """ Create a function to import data from the MSSQL database. """
         job_name = f"uec.import_from_{self.name}"
 
-        # you cannot pass identifiers as variables to plpgsql, so we use f-string
-        self.dbm.run_query(f"""
-            DROP FUNCTION IF EXISTS {job_name};
-            CREATE FUNCTION {job_name}(job_id INT DEFAULT NULL, config JSONB DEFAULT NULL)
+        # you cannot pass identifiers as variables to plpgsql, so they are composed client-side
+        self.dbm.run_query("""
+            DROP FUNCTION IF EXISTS {job};
+            CREATE FUNCTION {job}(job_id INT DEFAULT NULL, config JSONB DEFAULT NULL)
             RETURNS void
             LANGUAGE plpgsql
             AS $$
@@ -155,7 +153,7 @@ class FDWManager:
                 -- Get new error definitions
                 CREATE TEMP TABLE new_error_types ON COMMIT DROP AS (
                     SELECT *
-                    FROM {self.fdw_schema}.error_definitions edf
+                    FROM {schema}.error_definitions edf
                     WHERE edf.ErrorDefinitionID > COALESCE((SELECT MAX(ErrorDefinitionID) FROM uec.error_definitions), 0)
                 );
 
@@ -204,19 +202,20 @@ class FDWManager:
                 INSERT INTO uec.errors (Time, InstrumentID, ErrorID, MessageText)
                 SELECT
                     en.ErrorDtm,
-                    {self.instr_id},
+                    {instr_id},
                     ed.ErrorDefinitionID,
                     en.MessageText
-                FROM {self.fdw_schema}.error_notifications en
+                FROM {schema}.error_notifications en
                 JOIN uec.error_definitions ed ON ed.ErrorDefinitionID = en.ErrorDefinitionID
                 WHERE en.ErrorDtm > COALESCE(
-                    (SELECT MAX(Time) FROM uec.errors WHERE InstrumentID = {self.instr_id}),
+                    (SELECT MAX(Time) FROM uec.errors WHERE InstrumentID = {instr_id}),
                     '1900-01-01'
                 )
                 ON CONFLICT (Time, InstrumentID, ErrorID) DO NOTHING;
             END;
             $$;
-        """)
+        """, {"job": job_name, "schema": self.fdw_schema},
+            strings={"instr_id": self.instr_id}, mode=None)
 
         return job_name
 
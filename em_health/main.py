@@ -35,7 +35,8 @@ HM_EXE = r"C:\Program Files (x86)\Thermo Scientific Health Monitor\HealthMonitor
 
 def import_cmd(args):
     from em_health.utils.import_xml import main as func
-    func(args.input, args.settings, getattr(args, "nocopy", False))
+    # a manual import can simply be repeated after a server crash
+    func(args.input, args.settings, getattr(args, "nocopy", False), bulk=True)
 
 
 def create_task_cmd(args):
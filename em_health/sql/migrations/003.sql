@@ -6,7 +6,9 @@ BEGIN
     SELECT MAX(version) INTO current_version FROM public.schema_info;
 
     IF current_version = 2 THEN
-        -- tbd
+        -- 1. Staging data is transient, skip WAL for it
+        ALTER TABLE public.data_staging SET UNLOGGED;
+        COMMENT ON TABLE public.data_staging IS 'Template for per-session temporary staging tables used by bulk COPY inserts';
 
         -- N. Update schema version
         UPDATE public.schema_info SET version = 3;
@@ -105,14 +105,14 @@ COMMENT ON TABLE public.parameters_history IS 'Historical HM metadata for each p
 
 -- data table -------------------------------------------------------------------------------------
 -- Creating public.data
-CREATE TABLE IF NOT EXISTS public.data_staging (
+CREATE UNLOGGED TABLE IF NOT EXISTS public.data_staging (
                                            time TIMESTAMPTZ NOT NULL,
                                            instrument_id INTEGER NOT NULL,
                                            param_id INTEGER NOT NULL,
                                            value_num DOUBLE PRECISION,
                                            value_text TEXT
 );
-COMMENT ON TABLE public.data_staging IS 'Staging table for bulk COPY inserts';
+COMMENT ON TABLE public.data_staging IS 'Template for per-session temporary staging tables used by bulk COPY inserts';
 
 CREATE TABLE IF NOT EXISTS public.data (
                                            time TIMESTAMPTZ NOT NULL,
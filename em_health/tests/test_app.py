@@ -24,13 +24,16 @@
 # *
 # **************************************************************************
 
+import json
 import os.path
+import tempfile
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime as dt, timezone as tz
 
-from em_health.utils.import_xml import ImportXML
+from em_health.utils.import_xml import ImportXML, main as import_main
 from em_health.utils.tools import run_command
-from em_health.db_manager import DatabaseManager
+from em_health.db_manager import DatabaseManager, INSERT_PAGE_SIZE
 
 XML_FN = os.path.join(os.path.dirname(__file__), '9999_data.xml')
 JSON_INFO = [{
@@ -142,11 +145,55 @@ class TestEMHealth(unittest.TestCase):
         self.run_test_query(dbm, "SELECT abs_min FROM public.parameters_history WHERE instrument_id = %s AND param_id=%s",
                             (instrument_id, 351), 273.15)
 
+        # check updated instrument metadata
+        self.run_test_query(dbm, "SELECT host(server) FROM public.instruments WHERE id = %s",
+                            (instrument_id,), "127.0.0.2")
+
         print("[OK] database test #2")
 
     @staticmethod
-    def modify_input(enums: dict[str, dict],
+    def import_test_data(dbm: DatabaseManager) -> int:
+        """ Import the test XML and commit, return the instrument id. """
+        parser = ImportXML(XML_FN, JSON_INFO)
+        parser.parse_enumerations()
+        parser.parse_parameters()
+
+        instrument_id = dbm.add_instrument(dict(parser.get_microscope_dict()))
+        enum_ids = dbm.add_enumerations(instrument_id, parser.enum_values)
+        dbm.add_parameters(instrument_id, parser.params, enum_ids)
+        dbm.write_data(parser.parse_values(instrument_id, parser.params))
+        dbm.conn.commit()
+
+        return instrument_id
+
+    def check_clean_since(self, dbm: DatabaseManager, instrument_id: int):
+        """ Delete data older than a cutoff inside and then after the data range. """
+        since = dt(2025, 7, 28, 11, 0, tzinfo=tz.utc)
+        kept = self.run_test_query(dbm, "SELECT COUNT(*) FROM public.data WHERE instrument_id = %s AND time >= %s",
+                                   (instrument_id, since), expected_result=-1, do_return=True)
+        self.assertGreater(kept, 0)
+
+        # the cutoff falls inside a chunk, rows are removed by the boundary DELETE
+        dbm.clean_instrument_data(9999, since=since)
+        self.run_test_query(dbm, "SELECT COUNT(*) FROM public.data WHERE instrument_id = %s AND time < %s",
+                            (instrument_id, since), 0)
+        self.run_test_query(dbm, "SELECT COUNT(*) FROM public.data WHERE instrument_id = %s",
+                            (instrument_id,), kept)
+
+        # the whole chunk is older than the cutoff, it is removed by the per-chunk DELETE or drop_chunks
+        dbm.clean_instrument_data(9999, since=dt(2025, 9, 1, tzinfo=tz.utc))
+        self.run_test_query(dbm, "SELECT COUNT(*) FROM public.data WHERE instrument_id = %s",
+                            (instrument_id,), 0)
+
+        # metadata is kept
+        self.run_test_query(dbm, "SELECT COUNT(*) FROM public.parameters WHERE instrument_id = %s",
+                            (instrument_id,), 391)
+
+    @staticmethod
+    def modify_input(instr_dict: dict,
+                     enums: dict[str, dict],
                      params: dict[int, dict]):
+        instr_dict["server"] = "127.0.0.2"
         enums["FegState_enum"]["Operate"] = 99
         enums["FegState_enum"]["Standby"] = 100
         params[351]["abs_min"] = 250.5
@@ -159,7 +206,7 @@ class TestEMHealth(unittest.TestCase):
         parser.parse_parameters()
         self.check_parameters(parser.params)
 
-        instr_dict = parser.get_microscope_dict()
+        instr_dict = dict(parser.get_microscope_dict())
 
         with DatabaseManager(parser.db_name,
                              username="emhealth",
@@ -176,8 +223,8 @@ class TestEMHealth(unittest.TestCase):
             dbm.write_data(datapoints)
             self.check_db(dbm, instrument_id)
 
-            # modify enums and params
-            self.modify_input(parser.enum_values, parser.params)
+            # modify instrument, enums and params
+            self.modify_input(instr_dict, parser.enum_values, parser.params)
 
             # second import
             instrument_id = dbm.add_instrument(instr_dict)
@@ -191,6 +238,101 @@ class TestEMHealth(unittest.TestCase):
             # clean-up
             dbm.clean_instrument_data(instrument_serial=9999)
 
+    def test_copy_parameters(self):
+        """ Test the COPY path of add_parameters with a large parameter set. """
+        parser = ImportXML(XML_FN, JSON_INFO)
+        parser.parse_enumerations()
+        parser.parse_parameters()
+
+        # pad with copies of an existing parameter to go over the multi-row INSERT threshold
+        params = dict(parser.params)
+        for i in range(INSERT_PAGE_SIZE):
+            params[100000 + i] = dict(parser.params[351], param_name=f"Test{i}")
+
+        with DatabaseManager(parser.db_name,
+                             username="emhealth",
+                             password="POSTGRES_EMHEALTH_PASSWORD") as dbm:
+            instrument_id = dbm.add_instrument(dict(parser.get_microscope_dict()))
+            enum_ids = dbm.add_enumerations(instrument_id, parser.enum_values)
+            dbm.add_parameters(instrument_id, params, enum_ids)
+
+            self.run_test_query(dbm, "SELECT COUNT(*) FROM public.parameters WHERE instrument_id = %s",
+                                (instrument_id,), len(params))
+            self.run_test_query(dbm, "SELECT enum_id FROM public.parameters WHERE instrument_id = %s AND param_id=%s",
+                                (instrument_id, 400), enum_ids["CameraInsertStatus_enum"])
+
+            # existing parameters are updated by the trigger, not duplicated
+            params[351] = dict(params[351], abs_min=250.5)
+            params[100000] = dict(params[100000], display_name="Updated")
+            dbm.add_parameters(instrument_id, params, enum_ids)
+
+            self.run_test_query(dbm, "SELECT COUNT(*) FROM public.parameters WHERE instrument_id = %s",
+                                (instrument_id,), len(params))
+            self.run_test_query(dbm, "SELECT abs_min FROM public.parameters WHERE instrument_id = %s AND param_id=%s",
+                                (instrument_id, 351), 250.5)
+            self.run_test_query(dbm, "SELECT abs_min FROM public.parameters_history WHERE instrument_id = %s AND param_id=%s",
+                                (instrument_id, 351), 273.15)
+            self.run_test_query(dbm, "SELECT display_name FROM public.parameters WHERE instrument_id = %s AND param_id=%s",
+                                (instrument_id, 100000), "Updated")
+            print("[OK] parameters COPY test")
+
+            # clean-up
+            dbm.clean_instrument_data(instrument_serial=9999)
+
+    def test_clean_since(self):
+        """ Test date-bounded cleanup as emhealth, which deletes chunk by chunk. """
+        with DatabaseManager(JSON_INFO[0]["type"],
+                             username="emhealth",
+                             password="POSTGRES_EMHEALTH_PASSWORD") as dbm:
+            instrument_id = self.import_test_data(dbm)
+            self.check_clean_since(dbm, instrument_id)
+
+            # clean-up
+            dbm.clean_instrument_data(instrument_serial=9999)
+            print("[OK] clean since test")
+
+    def test_clean_drop_chunks(self):
+        """ Test cleanup as the table owner, which drops chunks and truncates. """
+        with DatabaseManager(JSON_INFO[0]["type"]) as dbm:
+            others = self.run_test_query(dbm, "SELECT COUNT(*) FROM public.instruments WHERE serial <> %s",
+                                         (9999,), expected_result=-1, do_return=True)
+            if others:
+                self.skipTest("chunks can only be dropped when the test instrument is the only one")
+
+            instrument_id = self.import_test_data(dbm)
+            self.check_clean_since(dbm, instrument_id)
+
+            # full cleanup truncates public.data and removes the instrument
+            self.import_test_data(dbm)
+            dbm.clean_instrument_data(instrument_serial=9999)
+            self.run_test_query(dbm, "SELECT COUNT(*) FROM public.data", (), 0)
+            self.run_test_query(dbm, "SELECT COUNT(*) FROM public.instruments WHERE serial = %s",
+                                (9999,), 0)
+            print("[OK] clean drop chunks test")
+
+    def test_concurrent_import(self):
+        """ Test two overlapping imports of the same instrument. """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            json_fn = os.path.join(tmp_dir, "instruments.json")
+            with open(json_fn, "w", encoding="utf-8") as f:
+                json.dump(JSON_INFO, f)
+
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                futures = [executor.submit(import_main, XML_FN, json_fn, False) for _ in range(2)]
+                for future in futures:
+                    future.result()
+
+        with DatabaseManager(JSON_INFO[0]["type"],
+                             username="emhealth",
+                             password="POSTGRES_EMHEALTH_PASSWORD") as dbm:
+            instrument_id = self.run_test_query(dbm, "SELECT id FROM public.instruments WHERE serial = %s",
+                                                (9999,), expected_result=-1, do_return=True)
+            # both imports succeeded and duplicates were skipped
+            self.check_db(dbm, instrument_id)
+
+            # clean-up
+            dbm.clean_instrument_data(instrument_serial=9999)
+
     def test_pgtap(self):
         """ Run database tests with pgTAP. """
         run_command('docker exec timescaledb bash -c "pg_prove -d tem -U postgres /sql/tests/pgtap/*.sql"')
@@ -37,6 +37,7 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 
+from em_health.db_client import close_pools
 from em_health.db_manager import DatabaseManager
 from em_health.utils.tools import logger, run_command
 
@@ -95,22 +96,15 @@ class CSVLoader:
         return list(df.itertuples(index=False, name=None))
 
     @staticmethod
-    def stream_chunks(file_path: str, max_size: int) -> Iterable[str]:
-        """Yield ~max_size byte chunks from a CSV (or gzipped CSV)."""
-        buffer: list[str] = []
-        size = 0
-
+    def stream_chunks(file_path: str, max_size: int) -> Iterable[bytes]:
+        """Yield max_size byte chunks from a CSV (or gzipped CSV).
+        COPY data does not need to be split on line boundaries,
+        so raw blocks are passed through without per-line buffering.
+        """
         open_func = gzip.open if file_path.endswith(".gz") else open
-        with open_func(file_path, "rt", encoding="utf-8") as f:
-            for line in f:
-                buffer.append(line)
-                size += len(line.encode("utf-8"))
-                if size >= max_size:
-                    yield "".join(buffer)
-                    buffer.clear()
-                    size = 0
-            if buffer:
-                yield "".join(buffer)
+        with open_func(file_path, "rb") as f:
+            while chunk := f.read(max_size):
+                yield chunk
 
 
 class DataSimulator:
@@ -216,6 +210,7 @@ class Benchmark:
     # --- DB setup ---
     @staticmethod
     def create_test_db() -> None:
+        close_pools()  # pooled connections would block DROP DATABASE
         cmd = r"""
             docker exec timescaledb bash -c "\
             psql -d postgres -c \"DROP DATABASE IF EXISTS benchmark;\" && \
@@ -375,7 +370,6 @@ class TestPerformance:
     def test_import(
         self,
         filename: str = "test_data.xml.gz",
-        copy_chunk_size: int = 8 * 1024 * 1024,
         nocopy: bool = False,
         table_chunk_size: str = "3 days",
         table_compression: str = "7 days",
@@ -415,16 +409,15 @@ class TestPerformance:
                 datapoints = parser.parse_values(instrument_id, parser.params)
 
                 t0 = time.perf_counter()
-                dbm.write_data(datapoints, nocopy=nocopy, chunk_size=copy_chunk_size)
+                rows_inserted = dbm.write_data(datapoints, nocopy=nocopy)
+                dbm.conn.commit()
                 elapsed = time.perf_counter() - t0
 
-                rows_inserted = dbm.cur.rowcount
                 stats.record(rows_inserted, elapsed)
 
         summary = stats.summary(trials)
         logger.info(
             f"Using {"EXECUTEMANY" if nocopy else "COPY"} to ingest XML data:\n"
-            f"\tCOPY chunk size: {copy_chunk_size / 1024 / 1024} MB\n"
             f"\tHypertable chunk size: {table_chunk_size}\n"
             f"\tHypertable compression: {table_compression}\n"
             f"\tRaw run times: {stats.times}, rows/s: {stats.throughputs}\n"
@@ -28,6 +28,7 @@ import os
 import sys
 import gzip
 from datetime import datetime, timezone
+from functools import lru_cache
 import json
 import xml.etree.ElementTree as ET  # https://github.com/lxml/lxml/blob/master/doc/performance.txt#L293
 from typing import Iterable
@@ -38,6 +39,14 @@ from em_health.utils.tools import logger
 
 NS = {'ns': 'HealthMonitorExport http://schemas.fei.com/HealthMonitor/Export/2009/07'}
 
+# value_type: function returning (value_num, value_text)
+CONVERTERS = {
+    "str": lambda v: (None, str(v)),
+    "float": lambda v: (float(v), None),
+    "int": lambda v: (int(v), None),  # works for int, IntEnum
+    "bool": lambda v: (int(v.strip() == "true"), None),
+}
+
 
 class ImportXML:
     def __init__(self,
@@ -176,19 +185,21 @@ class ImportXML:
                     elem.clear()  # clear skipped elements
                     continue
                 value_type = param_dict["value_type"]
+                # resolve the converter once per parameter, not per value
+                convert = CONVERTERS[value_type]
 
                 param_values_elem = elem.find('ns:ParameterValues', namespaces=NS)
                 if param_values_elem is not None:
                     for pval in param_values_elem.findall('ns:ParameterValue', namespaces=NS):
                         timestamp = self.__parse_ts_to_utc(pval.get("Timestamp"))
-                        value_elem = pval.find('ns:Value', namespaces=NS)
-                        value_text_raw = value_elem.text
-                        value_num, value_text = self.__convert_value(param_id, value_text_raw, value_type)
-                        if value_num is None and value_text is None:
-                            continue  # failed to convert value
+                        value_text_raw = pval.find('ns:Value', namespaces=NS).text
+                        try:
+                            value_num, value_text = convert(value_text_raw)
+                        except (ValueError, TypeError):
+                            logger.error(f"Cannot convert '{value_text_raw}' to {value_type} for param {param_id}")
+                            continue
 
-                        point = (timestamp, instr_id, param_id, value_num, value_text)
-                        yield point
+                        yield timestamp, instr_id, param_id, value_num, value_text
 
                 elem.clear()  # Clear after handling <ValueData> and its children
 
@@ -208,38 +219,16 @@ class ImportXML:
         return elem.tag.endswith(f"}}{name}")
 
     @staticmethod
+    @lru_cache(maxsize=4096)
     def __parse_ts_to_utc(ts: str) -> datetime:
         """ Parse timestamp string into UTC.
+        Parameters are often sampled at the same moment, so parsed values are cached.
         :param ts: input timestamp string
         """
-        ts = ts.replace("Z", "+00:00")
-        dt = datetime.fromisoformat(ts)
-        return dt.astimezone(timezone.utc)
+        return datetime.fromisoformat(ts).astimezone(timezone.utc)
 
-    @staticmethod
-    def __convert_value(param_id: int,
-                        value: str,
-                        value_type: str):
-        """ Convert the param value according to type.
-        Returns value_num, value_text.
-        """
-        try:
-            if value_type == "str":
-                return None, str(value)
-            elif value_type == "float":
-                return float(value), None
-            elif value_type == "int":  # works for int, IntEnum
-                return int(value), None
-            elif value_type == "bool":
-                return int(value.strip() == "true"), None
-            else:
-                raise ValueError
-        except (ValueError, TypeError):
-            logger.error(f"Cannot convert '{value}' to {value_type} for param {param_id}")
-            return None, None
-
-
-def main(xml_fn, json_fn, nocopy):
+
+def main(xml_fn, json_fn, nocopy, bulk=False):
     # Validate JSON file
     if not (os.path.exists(json_fn) and json_fn.endswith(".json")):
         logger.error("Settings file '%s' not found or is not a .json file.", json_fn)
@@ -281,8 +270,12 @@ def main(xml_fn, json_fn, nocopy):
             instrument_id = dbm.add_instrument(instr_dict)
             enum_ids = dbm.add_enumerations(instrument_id, xmlparser.enum_values)
             dbm.add_parameters(instrument_id, xmlparser.params, enum_ids)
+            # add_instrument locks the instrument row, commit the metadata before
+            # the long data load, so concurrent imports of this instrument wait only for it
+            dbm.conn.commit()
+
             datapoints = xmlparser.parse_values(instrument_id, xmlparser.params)
-            dbm.write_data(datapoints, nocopy=nocopy)
+            dbm.write_data(datapoints, nocopy=nocopy, bulk=bulk)
     else:
         logger.error("File %s has wrong format", xml_fn)
         sys.exit(1)
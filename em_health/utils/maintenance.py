@@ -65,10 +65,8 @@ def erase_db(dbname: str, ts_version: str | None = None, do_init: bool = False)
     version_clause = f" VERSION '{ts_version}'" if ts_version else ""
     cmd = f"""
 docker exec {PG_CONTAINER} bash -c "\
-psql -d postgres -c \\"SELECT pg_terminate_backend(pid) FROM pg_stat_activity WHERE datname = '{dbname}';\\" && \
-psql -d postgres -c \\"DROP DATABASE IF EXISTS {dbname};\\" && \
-psql -d postgres -c \\"CREATE DATABASE {dbname};\\" && \
-psql -d tem -c \\"CREATE EXTENSION IF NOT EXISTS timescaledb{version_clause} CASCADE; CREATE EXTENSION IF NOT EXISTS timescaledb_toolkit CASCADE;\\""
+psql -v ON_ERROR_STOP=1 -d postgres -c \\"DROP DATABASE IF EXISTS {dbname} WITH (FORCE);\\" -c \\"CREATE DATABASE {dbname};\\" && \
+psql -d {dbname} -c \\"CREATE EXTENSION IF NOT EXISTS timescaledb{version_clause} CASCADE; CREATE EXTENSION IF NOT EXISTS timescaledb_toolkit CASCADE;\\""
 """
     run_command(cmd)
 
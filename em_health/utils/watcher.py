@@ -55,7 +55,7 @@ class FileWatcher:
         self.json_fn = json_fn
         self.interval = interval or int(os.getenv("WATCH_INTERVAL", 300))
         self.stable_time = stable_time or int(os.getenv("WATCH_SIZE_COUNTER", 10))
-        self.max_workers = max_workers or int(os.getenv("WATCH_MAX_WORKERS", 4))
+        self.max_workers = max_workers or int(os.getenv("WATCH_WORKERS", 4))
         self.observer = PollingObserver(timeout=self.interval)
         self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
         self.processed_files = set()